@@ -0,0 +1,211 @@
+"""Per-worker admission control and load shedding.
+
+Public requests run under a bounded concurrency limit. When every slot is
+busy a request may wait in a short queue for up to `queue_timeout` seconds;
+once the queue is full or the deadline passes the request is shed. A shed GET
+gets the last good copy of the page if one was seen, otherwise a fast 503
+with Retry-After, instead of piling up until gunicorn's worker timeout.
+
+Admin routes draw on their own reserved slots so editors can keep working
+during a spike. Static files bypass admission entirely.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+SHED_BODY = (
+    b'<!DOCTYPE html><html><head><title>The Scope</title></head><body>'
+    b'<p>The Scope is very busy right now. Please try again in a few seconds.</p>'
+    b'</body></html>'
+)
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class _Releasing:
+    """Iterate a response, releasing its admission slot when closed."""
+
+    def __init__(self, app_iter, release):
+        self.app_iter = app_iter
+        self.release = release
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.release()
+
+
+class AdmissionControl:
+    """Wrap a WSGI app: app.wsgi_app = AdmissionControl(app.wsgi_app)."""
+
+    def __init__(self, app, max_concurrency=4, max_queue=3, queue_timeout=0.5,
+                 admin_slots=1, retry_after=5, stale_entries=64):
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.admin_slots = admin_slots
+        self.retry_after = retry_after
+        self.stale_entries = stale_entries
+
+        self._public = threading.BoundedSemaphore(max_concurrency)
+        self._admin = threading.BoundedSemaphore(admin_slots)
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._counts = {'admitted': 0, 'queued': 0, 'timed_out': 0,
+                        'shed_stale': 0, 'shed_unavailable': 0}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path.startswith('/static/'):
+            return self.app(environ, start_response)
+
+        if path.startswith('/admin'):
+            release = self._acquire_admin()
+        else:
+            release = self._acquire_public()
+        if release is None:
+            return self._shed(environ, start_response)
+
+        with self._lock:
+            self._counts['admitted'] += 1
+            self._in_flight += 1
+        release = self._once(release)
+
+        if self._is_cacheable(environ):
+            return self._call_and_record(environ, start_response, release)
+        try:
+            app_iter = self.app(environ, start_response)
+        except BaseException:
+            release()
+            raise
+        return _Releasing(app_iter, release)
+
+    # ── Slots ──────────────────────────────────────────────
+
+    def _acquire_public(self):
+        if self._public.acquire(blocking=False):
+            return self._public.release
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                return None
+            self._waiting += 1
+            self._counts['queued'] += 1
+        try:
+            acquired = self._public.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            with self._lock:
+                self._counts['timed_out'] += 1
+            return None
+        return self._public.release
+
+    def _acquire_admin(self):
+        # Editors may borrow an idle public slot, but never queue behind the public.
+        if self._public.acquire(blocking=False):
+            return self._public.release
+        if self._admin.acquire(timeout=self.queue_timeout):
+            return self._admin.release
+        return None
+
+    def _once(self, release):
+        released = []
+
+        def once():
+            if not released:
+                released.append(True)
+                with self._lock:
+                    self._in_flight -= 1
+                release()
+        return once
+
+    # ── Stale copies ───────────────────────────────────────
+
+    @staticmethod
+    def _key(environ):
+        query = environ.get('QUERY_STRING', '')
+        return environ.get('PATH_INFO', '') + ('?' + query if query else '')
+
+    @staticmethod
+    def _is_cacheable(environ):
+        return (environ.get('REQUEST_METHOD') == 'GET'
+                and not environ.get('PATH_INFO', '').startswith('/admin'))
+
+    def _call_and_record(self, environ, start_response, release):
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers]
+            return start_response(status, headers, exc_info)
+
+        try:
+            app_iter = self.app(environ, capture)
+            try:
+                body = b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            release()
+
+        status, headers = captured
+        mimetype = (_header(headers, 'Content-Type') or '').split(';')[0].strip()
+        if (status.startswith('200') and mimetype == 'text/html'
+                and not _header(headers, 'Set-Cookie')):
+            with self._lock:
+                self._stale[self._key(environ)] = (status, list(headers), body)
+                self._stale.move_to_end(self._key(environ))
+                while len(self._stale) > self.stale_entries:
+                    self._stale.popitem(last=False)
+        return [body]
+
+    def _shed(self, environ, start_response):
+        stale = None
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            with self._lock:
+                stale = self._stale.get(self._key(environ))
+
+        if stale is not None:
+            with self._lock:
+                self._counts['shed_stale'] += 1
+            status, headers, body = stale
+            start_response(status, headers + [('X-Cache', 'STALE')])
+            return [body]
+
+        with self._lock:
+            self._counts['shed_unavailable'] += 1
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Content-Length', str(len(SHED_BODY))),
+            ('Retry-After', str(self.retry_after)),
+            ('Cache-Control', 'no-store'),
+        ])
+        return [SHED_BODY]
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counts,
+                in_flight=self._in_flight,
+                waiting=self._waiting,
+                stale_pages=len(self._stale),
+                max_concurrency=self.max_concurrency,
+                max_queue=self.max_queue,
+                admin_slots=self.admin_slots,
+            )
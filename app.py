@@ -1,4 +1,5 @@
 import os
+import re
 import uuid
 from datetime import datetime
 
@@ -7,20 +8,72 @@ load_dotenv()
 
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, flash, abort,
+    session, flash, abort, g, jsonify,
 )
 from werkzeug.utils import secure_filename
 import markdown2
 import db
+from admission import AdmissionControl
+from compression import CompressionMiddleware
+from fragment_cache import FragmentCacheExtension
+from profiling import Profiler, format_collapsed
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SCOPE_SECRET_KEY', 'dev-secret')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
+# Shed load before compressing, so stale copies are stored uncompressed
+admission = AdmissionControl(
+    app.wsgi_app,
+    max_concurrency=int(os.environ.get('SCOPE_MAX_CONCURRENCY', 4)),
+    max_queue=int(os.environ.get('SCOPE_MAX_QUEUE', 3)),
+    queue_timeout=float(os.environ.get('SCOPE_QUEUE_TIMEOUT', 0.5)),
+    admin_slots=int(os.environ.get('SCOPE_ADMIN_SLOTS', 1)),
+    retry_after=int(os.environ.get('SCOPE_RETRY_AFTER', 5)),
+)
+compression = CompressionMiddleware(
+    admission,
+    min_size=int(os.environ.get('SCOPE_COMPRESS_MIN_SIZE', 1024)),
+    cache_bytes=int(os.environ.get('SCOPE_COMPRESS_CACHE_MB', 16)) * 1024 * 1024,
+)
+app.wsgi_app = compression
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache.max_entries = int(os.environ.get('SCOPE_FRAGMENT_CACHE_SIZE', 1000))
 
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
 ALLOWED_PDF_EXTENSIONS = {'pdf'}
 ADMIN_PASSWORD = os.environ.get('SCOPE_ADMIN_PASSWORD', 'changeme')
 
+# Self-hosted fonts are produced by build_assets.py; until then base.html
+# falls back to the Google Fonts stylesheet.
+FONTS_DIR = os.path.join(app.static_folder, 'fonts')
+app.jinja_env.globals['self_hosted_fonts'] = os.path.exists(os.path.join(FONTS_DIR, 'fonts.css'))
+
+
+def preload_fonts(fonts_css, family='Lora', weights=('400', '500')):
+    """Unique font files in fonts.css serving the body and heading weights."""
+    if not os.path.exists(fonts_css):
+        return []
+    with open(fonts_css) as f:
+        css = f.read()
+    urls = []
+    for block in re.findall(r'@font-face\s*{[^}]*}', css):
+        weight = re.search(r'font-weight:\s*(\d+)', block)
+        url = re.search(r'url\(([^)]+)\)', block)
+        if (f"'{family}'" in block and weight and weight.group(1) in weights
+                and url and url.group(1) not in urls):
+            urls.append(url.group(1))
+    return urls
+
+
+PRELOAD_FONTS = preload_fonts(os.path.join(FONTS_DIR, 'fonts.css'))
+
+# Set SCOPE_PROFILE_THRESHOLD_MS=0 to turn off slow-request capture.
+profiler = Profiler(
+    threshold_ms=int(os.environ.get('SCOPE_PROFILE_THRESHOLD_MS', 1000)),
+    interval_ms=int(os.environ.get('SCOPE_PROFILE_INTERVAL_MS', 5)),
+    keep=int(os.environ.get('SCOPE_PROFILE_KEEP', 20)),
+)
+
 
 def allowed_file(filename, allowed):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed
@@ -33,9 +86,64 @@ def inject_site():
         site = db.get_site_settings()
     except Exception:
         site = {'title': 'The Scope', 'mascot_url': '', 'mission': ''}
+    g.site = site
     return {'site': site}
 
 
+# Let the browser start fetching the stylesheet, fonts and mascot while the
+# HTML is still downloading.
+@app.after_request
+def add_preload_headers(response):
+    if response.mimetype != 'text/html':
+        return response
+    links = [f"<{url_for('static', filename='css/style.css')}>; rel=preload; as=style"]
+    for font_url in PRELOAD_FONTS:
+        links.append(f"<{font_url}>; "
+                     "rel=preload; as=font; type=font/woff2; crossorigin")
+    mascot_url = g.get('site', {}).get('mascot_url')
+    if mascot_url:
+        links.append(f'<{mascot_url}>; rel=preload; as=image')
+    response.headers.add('Link', ', '.join(links))
+    return response
+
+
+# ── Profiling ──────────────────────────────────────────────
+
+# Admins can profile any page with ?profile=collapsed|pstats or an
+# X-Profile header; slow requests are captured for /admin/profiles.
+@app.before_request
+def start_profiling():
+    if request.endpoint == 'static':
+        return
+    mode = request.args.get('profile') or request.headers.get('X-Profile')
+    if mode and 'admin' not in session:
+        mode = None
+    g.profile = profiler.begin(mode)
+
+
+@app.after_request
+def finish_profiling(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    result = profiler.end(profile, request.method, request.full_path, response.status_code)
+    if result is None:
+        return response
+    data, mimetype = result
+    response = app.response_class(data, mimetype=mimetype)
+    if mimetype == 'application/octet-stream':
+        response.headers['Content-Disposition'] = 'attachment; filename=profile.pstats'
+    return response
+
+
+@app.teardown_request
+def abandon_profiling(exc):
+    # Only reached with a profile still open when the request raised.
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.end(profile, request.method, request.full_path, 500)
+
+
 # ── Error Handlers ─────────────────────────────────────────
 
 @app.errorhandler(404)
@@ -110,6 +218,35 @@ def admin():
     return render_template('admin_dashboard.html')
 
 
+@app.route('/admin/metrics')
+def admin_metrics():
+    if 'admin' not in session:
+        return redirect(url_for('admin'))
+    return jsonify({
+        'fragment_cache': app.jinja_env.fragment_cache.stats(),
+        'compression_cache': compression.cache.stats(),
+        'admission': admission.stats(),
+    })
+
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    if 'admin' not in session:
+        return redirect(url_for('admin'))
+    return render_template('admin_profiles.html', captures=profiler.captures(),
+                           threshold_ms=profiler.threshold_ms, pid=os.getpid())
+
+
+@app.route('/admin/profiles/<capture_id>')
+def admin_profile_stacks(capture_id):
+    if 'admin' not in session:
+        return redirect(url_for('admin'))
+    capture = profiler.get_capture(capture_id)
+    if not capture:
+        abort(404)
+    return app.response_class(format_collapsed(capture['stacks']), mimetype='text/plain')
+
+
 @app.route('/admin/logout')
 def admin_logout():
     session.pop('admin', None)
@@ -512,4 +649,6 @@ def admin_about_move(member_id, direction):
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5002))
+    # Fragments would otherwise hide template edits picked up by the reloader.
+    app.jinja_env.fragment_cache.enabled = False
     app.run(host='0.0.0.0', port=port, debug=True)
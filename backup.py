@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Stream all site content to or from NDJSON for backups and bulk loading.
+
+Each line of the NDJSON stream is one row: {"table": "news", "row": {...}}.
+Export pages through every table in primary key order and import upserts in
+chunks, so memory use stays constant whatever the size of the archive.
+
+With --with-files the stream is a tar archive holding content.ndjson followed
+by every storage object the rows reference, stored as storage/<bucket>/<path>.
+On import the objects are uploaded to the target project and the URLs in the
+rows are rewritten to point at it, so an archive from production can seed a
+staging or benchmark instance. A plain NDJSON import keeps the URLs as they
+are, still pointing at the source project's objects.
+
+Usage:
+  python backup.py export [FILE] [--with-files]   # FILE defaults to stdout
+  python backup.py import [FILE] [--with-files]   # FILE defaults to stdin
+"""
+
+import argparse
+import io
+import json
+import sys
+import tarfile
+import tempfile
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import db
+
+CHUNK_SIZE = 500
+NDJSON_NAME = 'content.ndjson'
+
+# Columns holding public storage URLs, and the bucket each one lives in.
+FILE_FIELDS = {
+    'site_settings': {'mascot_url': 'uploads', 'current_edition_pdf_url': 'pdfs'},
+    'publications': {'pdf_url': 'pdfs', 'cover_url': 'uploads'},
+    'news': {'image_url': 'uploads'},
+    'team_members': {'image_url': 'uploads'},
+}
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def storage_refs(table, row):
+    """Yield (bucket, path) for each storage object a row references."""
+    for field, bucket in FILE_FIELDS.get(table, {}).items():
+        path = db.storage_path(bucket, row.get(field))
+        if path:
+            yield bucket, path
+
+
+# ── Export ─────────────────────────────────────────────────
+
+def write_ndjson(out, refs=None):
+    """Write every row as NDJSON to the binary stream `out`."""
+    for table in db.TABLES:
+        count = 0
+        for row in db.iter_rows(table, CHUNK_SIZE):
+            line = json.dumps({'table': table, 'row': row}, separators=(',', ':'))
+            out.write(line.encode('utf-8') + b'\n')
+            if refs is not None:
+                refs.update(storage_refs(table, row))
+            count += 1
+        log(f'  {table}: {count} rows')
+
+
+def export(out, with_files):
+    log('=== Export ===')
+    if not with_files:
+        write_ndjson(out)
+        return
+
+    refs = set()
+    with tarfile.open(fileobj=out, mode='w|') as tar:
+        # A tar member needs its size up front, so spool the rows to disk first.
+        with tempfile.TemporaryFile() as tmp:
+            write_ndjson(tmp, refs)
+            info = tarfile.TarInfo(NDJSON_NAME)
+            info.size = tmp.tell()
+            tmp.seek(0)
+            tar.addfile(info, tmp)
+
+        for bucket, path in sorted(refs):
+            try:
+                data = db.download_object(bucket, path)
+            except Exception as e:
+                log(f'  [skip] {bucket}/{path}: {e}')
+                continue
+            info = tarfile.TarInfo(f'storage/{bucket}/{path}')
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        log(f'  storage: {len(refs)} objects')
+
+
+# ── Import ─────────────────────────────────────────────────
+
+def rewrite_urls(table, row):
+    """Point storage URLs at the target project's copy of each object."""
+    for field, bucket in FILE_FIELDS.get(table, {}).items():
+        path = db.storage_path(bucket, row.get(field))
+        if path:
+            row[field] = db.public_url(bucket, path)
+    return row
+
+
+def read_ndjson(lines, rewrite=False):
+    """Upsert rows from an iterable of NDJSON lines in chunks of CHUNK_SIZE.
+
+    With `rewrite`, storage URLs are pointed at the target project; only do
+    this when the objects themselves are being imported too.
+    """
+    pending = {}
+    counts = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        table = record['table']
+        if table not in db.TABLES:
+            raise SystemExit(f'Unknown table in import: {table}')
+        rows = pending.setdefault(table, [])
+        row = record['row']
+        rows.append(rewrite_urls(table, row) if rewrite else row)
+        if len(rows) >= CHUNK_SIZE:
+            db.upsert_rows(table, rows)
+            counts[table] = counts.get(table, 0) + len(rows)
+            rows.clear()
+
+    for table in db.TABLES:
+        rows = pending.get(table, [])
+        db.upsert_rows(table, rows)
+        counts[table] = counts.get(table, 0) + len(rows)
+        log(f'  {table}: {counts[table]} rows')
+
+
+def import_(src, with_files):
+    log('=== Import ===')
+    if not with_files:
+        read_ndjson(src)
+        return
+
+    objects = 0
+    with tarfile.open(fileobj=src, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            f = tar.extractfile(member)
+            if member.name == NDJSON_NAME:
+                read_ndjson(f, rewrite=True)
+            elif member.name.startswith('storage/'):
+                bucket, _, path = member.name[len('storage/'):].partition('/')
+                db.upload_object(bucket, path, f.read())
+                objects += 1
+    log(f'  storage: {objects} objects')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or import all site content as NDJSON.')
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('file', nargs='?', default='-', help="path, or '-' for stdout/stdin")
+    parser.add_argument('--with-files', action='store_true',
+                        help='bundle referenced storage objects in a tar stream')
+    args = parser.parse_args()
+
+    if db.supabase is None:
+        raise SystemExit('Set SUPABASE_URL and SUPABASE_KEY in .env')
+
+    if args.command == 'export':
+        if args.file == '-':
+            export(sys.stdout.buffer, args.with_files)
+        else:
+            with open(args.file, 'wb') as out:
+                export(out, args.with_files)
+    else:
+        if args.file == '-':
+            import_(sys.stdin.buffer, args.with_files)
+        else:
+            with open(args.file, 'rb') as src:
+                import_(src, args.with_files)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Build front-end assets that are served from this app instead of third parties.
+
+Two steps:
+  1. Fonts: download the latin subset of Lora and Merriweather as WOFF2 from
+     Google Fonts into static/fonts/ and write static/fonts/fonts.css with
+     font-display: swap.
+  2. Critical CSS: extract the above-the-fold rules (navbar, page shell,
+     headings, cards) from static/css/style.css, minify them together with
+     fonts.css and write templates/critical_css.html, which base.html inlines.
+     The full stylesheet is then loaded without blocking first paint.
+
+Re-run after editing style.css and commit the generated files. The fonts step
+needs network access to Google Fonts; until static/fonts/ has been built and
+committed, base.html loads the Google Fonts stylesheet without blocking render.
+
+Usage:
+  python build_assets.py               # fonts + critical CSS
+  python build_assets.py --skip-fonts  # critical CSS only (no network)
+"""
+
+import os
+import re
+import sys
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STYLE_PATH = os.path.join(BASE_DIR, 'static', 'css', 'style.css')
+FONTS_DIR = os.path.join(BASE_DIR, 'static', 'fonts')
+FONTS_CSS_PATH = os.path.join(FONTS_DIR, 'fonts.css')
+CRITICAL_PATH = os.path.join(BASE_DIR, 'templates', 'critical_css.html')
+
+GOOGLE_FONTS_URL = (
+    'https://fonts.googleapis.com/css2'
+    '?family=Lora:wght@400;500;600'
+    '&family=Merriweather:wght@300;400;700'
+    '&display=swap'
+)
+# Google only serves WOFF2 (split into unicode-range subsets) to modern browsers.
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+FONT_SUBSET = 'latin'
+
+# First tag/class of a selector that makes a rule part of the critical CSS.
+CRITICAL_SELECTORS = {
+    'body', 'main', 'h1', 'h2', 'h3', 'h4',
+    '.navbar', '.navbar-container', '.navbar-logo', '.navbar-links',
+    '.rufus-placeholder', '.site-title', '.accent', '.card',
+}
+
+
+def fetch(url):
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as res:
+        return res.read()
+
+
+# ── Fonts ──────────────────────────────────────────────────
+
+def build_fonts():
+    print('=== Fonts ===')
+    css = fetch(GOOGLE_FONTS_URL).decode('utf-8')
+    os.makedirs(FONTS_DIR, exist_ok=True)
+
+    # Google labels each @font-face with its subset: "/* latin */ @font-face {...}"
+    blocks = re.findall(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*{[^}]*})', css)
+    parsed = []
+    for subset, block in blocks:
+        if subset != FONT_SUBSET:
+            continue
+        family = re.search(r"font-family:\s*'([^']+)'", block).group(1)
+        weight = re.search(r'font-weight:\s*(\d+)', block).group(1)
+        src_url = re.search(r'url\(([^)]+)\)', block).group(1)
+        parsed.append((family, weight, src_url, block))
+
+    # Variable fonts serve every weight from one file, so name files after
+    # their source URL and download each only once.
+    urls_per_family = {}
+    for family, _, src_url, _ in parsed:
+        urls_per_family.setdefault(family, set()).add(src_url)
+
+    filenames = {}
+    faces = []
+    for family, weight, src_url, block in parsed:
+        if src_url not in filenames:
+            if len(urls_per_family[family]) == 1:
+                filename = f"{family.lower()}-{FONT_SUBSET}.woff2"
+            else:
+                filename = f"{family.lower()}-{weight}-{FONT_SUBSET}.woff2"
+            print(f"  Downloading {family} -> {filename}")
+            with open(os.path.join(FONTS_DIR, filename), 'wb') as f:
+                f.write(fetch(src_url))
+            filenames[src_url] = filename
+
+        block = block.replace(src_url, f'/static/fonts/{filenames[src_url]}')
+        block = re.sub(r'font-display:\s*\w+', 'font-display: swap', block)
+        faces.append(block)
+
+    if not faces:
+        raise SystemExit(f'No "{FONT_SUBSET}" faces found in Google Fonts response.')
+
+    with open(FONTS_CSS_PATH, 'w') as f:
+        f.write('\n'.join(faces) + '\n')
+    print(f"  Wrote {len(faces)} faces to {os.path.relpath(FONTS_CSS_PATH, BASE_DIR)}\n")
+
+
+# ── Critical CSS ───────────────────────────────────────────
+
+def minify(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def split_rules(css):
+    """Split a stylesheet into top-level (prelude, body) pairs."""
+    rules = []
+    depth = 0
+    start = 0
+    prelude = ''
+    for i, ch in enumerate(css):
+        if ch == '{':
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[start:i]))
+                start = i + 1
+    return rules
+
+
+def is_critical(selector):
+    first = selector.strip().split()[0]
+    names = re.findall(r'^[a-z0-9]+|\.[\w-]+', first)
+    return bool(names) and names[0] in CRITICAL_SELECTORS
+
+
+def extract_critical(css):
+    out = []
+    for prelude, body in split_rules(minify(css)):
+        if prelude.startswith('@media'):
+            inner = extract_critical(body)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif all(is_critical(sel) for sel in prelude.split(',')):
+            out.append(f'{prelude}{{{body}}}')
+    return ''.join(out)
+
+
+def build_critical_css():
+    print('=== Critical CSS ===')
+    with open(STYLE_PATH, 'r') as f:
+        critical = extract_critical(f.read())
+
+    if os.path.exists(FONTS_CSS_PATH):
+        with open(FONTS_CSS_PATH, 'r') as f:
+            critical = minify(f.read()) + critical
+    else:
+        print('  [skip] No static/fonts/fonts.css, base.html will load Google Fonts instead')
+
+    with open(CRITICAL_PATH, 'w') as f:
+        f.write('{# Generated by build_assets.py from static/css/style.css. Do not edit. #}\n')
+        f.write(critical + '\n')
+    print(f"  Wrote {len(critical)} bytes to {os.path.relpath(CRITICAL_PATH, BASE_DIR)}")
+
+
+def main():
+    if '--skip-fonts' not in sys.argv[1:]:
+        build_fonts()
+    build_critical_css()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""WSGI middleware that compresses responses according to Accept-Encoding.
+
+Brotli and zstd are used when their packages are installed, gzip always.
+Compressed bodies are kept in a small LRU keyed on the response's ETag (or a
+hash of the body when there is none) and the encoding, so a page whose content
+has not changed is compressed once rather than on every request.
+"""
+
+import gzip
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Already compressed; recompressing them wastes CPU for no gain.
+SKIP_TYPES = {
+    'application/pdf', 'application/zip', 'application/gzip',
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+    'font/woff', 'font/woff2',
+}
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml',
+}
+
+
+def _compressors():
+    """Available encodings, in server preference order."""
+    compressors = OrderedDict()
+    if brotli is not None:
+        compressors['br'] = lambda data: brotli.compress(data, quality=5)
+    if zstandard is not None:
+        compressors['zstd'] = lambda data: zstandard.ZstdCompressor(level=6).compress(data)
+    compressors['gzip'] = lambda data: gzip.compress(data, compresslevel=6)
+    return compressors
+
+
+def negotiate(accept_encoding, available):
+    """Pick the best encoding in `available` for an Accept-Encoding header.
+
+    Highest q-value wins; ties go to the order of `available`. Returns None
+    when the client should get the identity encoding.
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressedCache:
+    """Thread-safe LRU of compressed bodies, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self.size,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _encoded_etag(etag, encoding):
+    """The ETag of the `encoding` representation of a response tagged `etag`."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+_ENCODED_ETAG = re.compile(r'-(?:br|zstd|gzip)"')
+
+
+def _strip_encoded_etags(value):
+    """Map ETags we handed out for compressed bodies back to the app's own."""
+    return _ENCODED_ETAG.sub('"', value)
+
+
+def _is_compressible(mimetype):
+    if mimetype in SKIP_TYPES:
+        return False
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Wrap a WSGI app: app.wsgi_app = CompressionMiddleware(app.wsgi_app)."""
+
+    def __init__(self, app, min_size=1024, max_size=8 * 1024 * 1024,
+                 cache_bytes=16 * 1024 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.max_size = max_size
+        self.compressors = _compressors()
+        self.cache = CompressedCache(cache_bytes)
+
+    def __call__(self, environ, start_response):
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        # Clients revalidate with the ETag of the compressed body; the app
+        # only knows its own, so translate before it checks preconditions.
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        for name in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            if name in environ:
+                environ[name] = _strip_encoded_etags(environ[name])
+
+        app_iter = self.app(environ, capture)
+        status, headers, exc_info = captured
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''), self.compressors)
+        etag = _header(headers, 'ETag')
+
+        if status.startswith('304') and encoding and etag and if_none_match \
+                and _encoded_etag(etag, encoding) in if_none_match:
+            headers = [(k, v) for k, v in headers if k.lower() != 'etag']
+            headers.append(('ETag', _encoded_etag(etag, encoding)))
+            start_response(status, headers, exc_info)
+            return self._chain(written, app_iter)
+
+        mimetype = (_header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        if not _is_compressible(mimetype) or _header(headers, 'Content-Encoding'):
+            start_response(status, headers, exc_info)
+            return self._chain(written, app_iter)
+
+        headers = [(k, v) for k, v in headers if k.lower() != 'vary'] + [
+            ('Vary', self._vary(headers))]
+        length = _header(headers, 'Content-Length')
+        if (encoding is None or not status.startswith('200')
+                or environ.get('REQUEST_METHOD') == 'HEAD'
+                or 'no-transform' in (_header(headers, 'Cache-Control') or '')
+                or (length and int(length) > self.max_size)):
+            start_response(status, headers, exc_info)
+            return self._chain(written, app_iter)
+
+        try:
+            body = b''.join(written) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        if len(body) < self.min_size:
+            start_response(status, headers, exc_info)
+            return [body]
+
+        key = (etag or hashlib.sha1(body).hexdigest(), encoding)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self.compressors[encoding](body)
+            self.cache.put(key, compressed)
+
+        headers = [(k, v) for k, v in headers
+                   if k.lower() not in ('content-length', 'etag', 'accept-ranges')]
+        headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(len(compressed))))
+        if etag:
+            # The representation differs per encoding, so must its ETag.
+            headers.append(('ETag', _encoded_etag(etag, encoding)))
+        start_response(status, headers, exc_info)
+        return [compressed]
+
+    @staticmethod
+    def _vary(headers):
+        vary = _header(headers, 'Vary')
+        if not vary:
+            return 'Accept-Encoding'
+        if 'accept-encoding' in vary.lower():
+            return vary
+        return f'{vary}, Accept-Encoding'
+
+    @staticmethod
+    def _chain(written, app_iter):
+        if not written:
+            return app_iter
+        return _ClosingChain(written, app_iter)
+
+
+class _ClosingChain:
+    """Yield bytes passed to write() before the app's iterable, then close it."""
+
+    def __init__(self, written, app_iter):
+        self.written = written
+        self.app_iter = app_iter
+
+    def __iter__(self):
+        yield from self.written
+        yield from self.app_iter
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
@@ -118,14 +118,68 @@ def upload_file(bucket, file_obj, filename):
     return supabase.storage.from_(bucket).get_public_url(unique_name)
 
 
+def storage_path(bucket, file_url):
+    """Return the object path inside `bucket` for a public URL, or None."""
+    marker = f'/storage/v1/object/public/{bucket}/'
+    if not file_url or marker not in file_url:
+        return None
+    return file_url[file_url.index(marker) + len(marker):].split('?', 1)[0]
+
+
 def delete_file(bucket, file_url):
     """Delete a file from Supabase Storage given its public URL."""
     if not file_url:
         return
     try:
-        marker = f'/storage/v1/object/public/{bucket}/'
-        idx = file_url.index(marker)
-        path = file_url[idx + len(marker):]
+        path = storage_path(bucket, file_url)
+        if path is None:
+            raise ValueError(file_url)
         supabase.storage.from_(bucket).remove([path])
     except (ValueError, Exception):
         pass
+
+
+def download_object(bucket, path):
+    return supabase.storage.from_(bucket).download(path)
+
+
+def upload_object(bucket, path, data):
+    """Upload (or overwrite) an object at an exact path and return its public URL."""
+    ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    content_type = CONTENT_TYPES.get(ext, 'application/octet-stream')
+    supabase.storage.from_(bucket).upload(
+        path, data, {'content-type': content_type, 'upsert': 'true'}
+    )
+    return public_url(bucket, path)
+
+
+def public_url(bucket, path):
+    return supabase.storage.from_(bucket).get_public_url(path)
+
+
+# ── Bulk Export / Import ──────────────────────────────────
+
+TABLES = ['site_settings', 'publications', 'news', 'team_members']
+
+
+def iter_rows(table, chunk_size=500):
+    """Yield every row of `table` in primary key order, one page at a time.
+
+    Pages are fetched by keyset (id > last id seen), so memory use and the
+    cost of each query stay constant however large the table is.
+    """
+    last_id = None
+    while True:
+        query = supabase.table(table).select('*').order('id').limit(chunk_size)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.execute().data
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def upsert_rows(table, rows):
+    if rows:
+        supabase.table(table).upsert(rows).execute()
@@ -0,0 +1,96 @@
+"""Jinja fragment caching: {% cache 'name', key... %}...{% endcache %}.
+
+The first argument names the fragment (used for hit/miss metrics), the rest
+make up the key, typically a row id plus its content hash:
+
+    {% cache 'news-card', n.id, n|content_hash %} ... {% endcache %}
+
+Rendered fragments are kept in a per-process LRU, so a page render only
+re-runs the fragments whose data changed.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+def content_hash(value):
+    """Short stable hash of a row (or any JSON-able value) for cache keys."""
+    data = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments with per-fragment metrics."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._items = OrderedDict()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, key):
+        with self._lock:
+            metrics = self._metrics.setdefault(name, {'hits': 0, 'misses': 0})
+            value = self._items.get(key)
+            if value is None:
+                metrics['misses'] += 1
+                return None
+            self._items.move_to_end(key)
+            metrics['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'max_entries': self.max_entries,
+                'fragments': {name: dict(m) for name, m in self._metrics.items()},
+            }
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+        environment.filters['content_hash'] = content_hash
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key, caller):
+        cache = self.environment.fragment_cache
+        if not cache.enabled:
+            return caller()
+        name = key[0]
+        key = tuple(str(part) for part in key)
+        rv = cache.get(name, key)
+        if rv is None:
+            rv = caller()
+            cache.put(key, rv)
+        return rv
@@ -0,0 +1,203 @@
+"""On-demand request profiling and slow-request capture.
+
+A background thread samples the stacks of in-flight requests every
+`interval_ms` using sys._current_frames(), which costs nothing on the request
+threads themselves. When a request takes longer than `threshold_ms` its
+sampled stacks are kept in a ring buffer of the last `keep` slow requests.
+Each gunicorn worker keeps its own buffer, so capture ids carry the worker pid.
+
+A single request can also be profiled on demand, returning either collapsed
+stacks (one "frame;frame;frame count" line per stack, ready for
+flamegraph.pl or speedscope) or a cProfile dump readable with pstats. On-demand
+collapsed stacks come from tracing every call, weighted in microseconds, so
+even a request shorter than the sampling interval returns data.
+"""
+
+import cProfile
+import itertools
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+MODES = {'1': 'collapsed', 'collapsed': 'collapsed', 'pstats': 'pstats'}
+
+
+def frame_name(frame):
+    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f'{module}:{frame.f_code.co_name}'
+
+
+def collapse(frame):
+    """Format a frame's stack, root first, as 'module:function;...'."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def format_collapsed(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+class Sampler:
+    """Samples registered threads while at least one is registered."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def start(self, ident):
+        stacks = Counter()
+        with self._lock:
+            self._active[ident] = stacks
+            # Started lazily so each forked gunicorn worker gets its own thread.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='profiling-sampler', daemon=True).start()
+        self._wake.set()
+        return stacks
+
+    def stop(self, ident):
+        with self._lock:
+            return self._active.pop(ident, None)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+class Tracer:
+    """Deterministic collapsed stacks for the current thread via sys.setprofile.
+
+    Each stack is weighted by the microseconds spent with it on top.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._stack = []
+        self._last = None
+
+    def start(self):
+        # Seed with the live stack (this frame included) so returns pop it in step.
+        self._stack = collapse(sys._getframe()).split(';')
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+        self._event(None, 'stop', None)
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._stack:
+            self.stacks[';'.join(self._stack)] += int((now - self._last) * 1e6)
+        self._last = now
+        if event == 'call':
+            self._stack.append(frame_name(frame))
+        elif event == 'c_call':
+            self._stack.append(f"{getattr(arg, '__module__', None) or 'builtins'}:{arg.__name__}")
+        elif event in ('return', 'c_return', 'c_exception') and self._stack:
+            self._stack.pop()
+
+
+class Profile:
+    """State for one request being sampled and/or profiled."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.ident = threading.get_ident()
+        self.started = time.perf_counter()
+        self.stacks = None
+        self.cprofile = None
+        self.tracer = None
+
+
+class Profiler:
+    def __init__(self, threshold_ms=1000, interval_ms=5, keep=20):
+        self.threshold_ms = threshold_ms
+        self.sampler = Sampler(interval_ms / 1000)
+        self._captures = deque(maxlen=keep)
+        self._captures_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def begin(self, mode=None):
+        """Start profiling the current request; returns None if there is nothing to do.
+
+        `mode` is 'collapsed' or 'pstats' for an on-demand profile, or None to
+        only watch for a slow request.
+        """
+        mode = MODES.get(mode)
+        if mode is None and not self.threshold_ms:
+            return None
+        profile = Profile(mode)
+        if mode == 'pstats':
+            profile.cprofile = cProfile.Profile()
+            profile.cprofile.enable()
+        elif mode == 'collapsed':
+            profile.tracer = Tracer()
+            profile.tracer.start()
+        else:
+            profile.stacks = self.sampler.start(profile.ident)
+        return profile
+
+    def end(self, profile, method, path, status):
+        """Stop profiling. Returns (data, mimetype) for on-demand profiles, else None."""
+        self.sampler.stop(profile.ident)
+        if profile.cprofile is not None:
+            profile.cprofile.disable()
+        if profile.tracer is not None:
+            profile.tracer.stop()
+        duration_ms = (time.perf_counter() - profile.started) * 1000
+
+        # On-demand profiles are slowed down by the profiler itself, so only
+        # plain sampled requests count as slow.
+        if self.threshold_ms and duration_ms >= self.threshold_ms and profile.stacks:
+            capture = {
+                'id': f'{os.getpid()}-{next(self._ids)}',
+                'pid': os.getpid(),
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': round(duration_ms, 1),
+                'samples': sum(profile.stacks.values()),
+                'stacks': profile.stacks,
+            }
+            with self._captures_lock:
+                self._captures.appendleft(capture)
+
+        if profile.mode == 'pstats':
+            profile.cprofile.create_stats()
+            return marshal.dumps(profile.cprofile.stats), 'application/octet-stream'
+        if profile.mode == 'collapsed':
+            return format_collapsed(+profile.tracer.stacks), 'text/plain'
+        return None
+
+    def captures(self):
+        """Snapshot of the captured slow requests, newest first."""
+        with self._captures_lock:
+            return list(self._captures)
+
+    def get_capture(self, capture_id):
+        return next((c for c in self.captures() if c['id'] == capture_id), None)